@@ -1,8 +1,30 @@
 import os
 import time
-from typing import List, Tuple, Optional
+import threading
+from typing import Dict, Iterable, Optional
 import duckdb
 
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Column order of the 'roms' table (also the keys of the columnar batches produced by DatFileParser)
+ROM_COLUMNS = ("dat_filename", "platform", "game_name", "description", "rom_name", "size",
+               "crc", "md5", "sha1", "status", "system")
+
+# Arrow schema mirroring the 'roms' table. Fixed types skip per-batch type inference.
+ROMS_ARROW_SCHEMA = pa.schema([(name, pa.int64() if name == "size" else pa.string()) for name in ROM_COLUMNS]) if pa else None
+
+# WAL size that triggers an automatic checkpoint during bulk loads (DuckDB's default is 16MB,
+# which checkpoints after almost every flushed batch and rewrites the growing table each time)
+BULK_LOAD_CHECKPOINT_THRESHOLD = "1GB"
+
+# Fallback insert without pyarrow: every column is bound as one typed list and the lists are unnested side by side.
+# A single statement per batch, straight from the column lists (no row transpose, unlike executemany)
+INSERT_ROMS_UNNEST_SQL = "INSERT INTO roms SELECT " + ", ".join(
+    f"UNNEST(?::{'BIGINT' if name == 'size' else 'VARCHAR'}[])" for name in ROM_COLUMNS)
+
 class DatabaseManager:
     """
     Manages DuckDB connection, schema creation, and data insertion.
@@ -12,6 +34,10 @@ class DatabaseManager:
         
         self.db_path = db_path
         self.conn = None
+        # DuckDB connections are not safe for concurrent writers
+        self._write_lock = threading.Lock()
+        # True while batches inserted with commit=False wait for commit()
+        self._in_transaction = False
         
     def __enter__(self):
         
@@ -89,17 +115,57 @@ class DatabaseManager:
         self.conn.execute("DELETE FROM processed_files")
         self.conn.execute("DELETE FROM db_metadata")
 
-    def insert_batch(self, buffer: List[Tuple]):
-        """Inserts a batch of ROMs and marks their files as processed."""
-        if not buffer:
+    def insert_batch(self, columns: Dict[str, list], processed_files: Optional[Iterable[str]] = None, commit: bool = True):
+        """
+        Inserts a columnar batch of ROMs (one list per 'roms' column) and marks their files as processed.
+        Both writes share one transaction, so a batch is either fully committed (and resumable) or not at all.
+        With commit=False the transaction stays open and the next batches join it until commit() is called;
+        a failure then rolls back every uncommitted batch.
+        """
+        if not columns or not columns["dat_filename"]:
             return
+        
+        if processed_files is None:
+            processed_files = set(columns["dat_filename"])
             
-        # Insert ROM data
-        self.conn.executemany("INSERT INTO roms VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", buffer)
-        # Mark files as processed
-        unique_files = {row[0] for row in buffer}
-        for filename in unique_files:
-            self.conn.execute("INSERT OR IGNORE INTO processed_files (filename) VALUES (?)", (filename, ))
+        with self._write_lock:
+            if not self._in_transaction:
+                self.conn.begin()
+                self._in_transaction = True
+            try:
+                # Insert ROM data
+                if pa is not None:
+                    self._insert_roms_arrow(columns)
+                else:
+                    self.conn.execute(INSERT_ROMS_UNNEST_SQL, [columns[name] for name in ROM_COLUMNS])
+                # Mark files as processed: one statement for the whole batch, not one per file
+                self.conn.execute("INSERT OR IGNORE INTO processed_files (filename) SELECT UNNEST(?::VARCHAR[])",
+                                  (list(processed_files), ))
+                    
+                if commit:
+                    self.conn.commit()
+                    self._in_transaction = False
+            except:
+                self.conn.rollback()
+                self._in_transaction = False
+                raise
+
+    def commit(self):
+        """Commits the batches inserted with commit=False, if any."""
+        with self._write_lock:
+            if self._in_transaction:
+                self.conn.commit()
+                self._in_transaction = False
+
+    def _insert_roms_arrow(self, columns: Dict[str, list]):
+        """
+        Bulk inserts the batch from an Arrow record batch built directly from the column lists.
+        The relational insert_into() appends the whole batch without per-row planning (like executemany)
+        and without SQL text parsing or view (un)registration on every batch.
+        """
+        batch = pa.RecordBatch.from_pydict(columns, schema=ROMS_ARROW_SCHEMA)
+        
+        self.conn.from_arrow(batch).insert_into("roms")
             
     def export_to_parquet(self, db_path: str, parquet_path: str, threads: int = 1):
     
@@ -149,3 +215,16 @@ class DatabaseManager:
         """Sets the PRAGMA threads for DuckDB."""
         if thread_count > 0:
             self.conn.execute(f"PRAGMA threads={thread_count}")
+
+    def configure_bulk_load(self, thread_count: int, memory_limit: Optional[str] = None):
+        """
+        Tunes DuckDB for a large append-only import ('memory_limit' like '4GB', None keeps DuckDB's default).
+        Row order of 'roms' is irrelevant, so insertion order preservation is dropped to let DuckDB
+        compress and write row groups in parallel. Automatic checkpoints are spaced out as well:
+        committed batches stay durable in the WAL, which is checkpointed when the connection closes.
+        """
+        self.configure_threads(thread_count)
+        self.conn.execute("PRAGMA preserve_insertion_order=false")
+        self.conn.execute(f"SET checkpoint_threshold='{BULK_LOAD_CHECKPOINT_THRESHOLD}'")
+        if memory_limit:
+            self.conn.execute("SET memory_limit = ?", (memory_limit, ))
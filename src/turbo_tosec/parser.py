@@ -1,137 +1,207 @@
 import os
-from typing import List, Tuple, Optional
+import sys
+from typing import BinaryIO, Dict, Tuple, Optional, Union
 import re
 import xml.etree.ElementTree as ET
-import logging
+
+try:
+    # libxml2-backed parser, much faster on large DATs; the stdlib parser is the fallback
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+from turbo_tosec.database import ROM_COLUMNS
+
+# lxml iterparse options: drop whitespace-only text nodes, lift libxml2's size limits for huge DATs,
+# never expand custom entities (DAT files are data, not documents) and skip xml:id bookkeeping
+_LXML_OPTIONS = dict(remove_blank_text=True, huge_tree=True, resolve_entities=False, collect_ids=False)
+
+# Parse errors of whichever XML backend is in use
+_XML_ERRORS = (ET.ParseError, lxml_etree.XMLSyntaxError) if lxml_etree is not None else (ET.ParseError, )
+
+# ClrMamePro patterns, compiled once per process instead of once per parser/file
+# A whole game ( ... ) block in one match: quoted strings are skipped whole (TOSEC names contain parens)
+# and one level of nested entries (rom ( ... )) is allowed, which is all the CMP format uses
+_CMP_GAME_RE = re.compile(r'\bgame\s*\(((?:[^()"]|"[^"]*"|\((?:[^()"]|"[^"]*")*\))*)\)', re.IGNORECASE)
+# Entries of a game block in a single pass: (key, quoted value) for name/description, or the body of a rom ( ... )
+_CMP_GAME_ENTRY_RE = re.compile(r'\b(?:(name|description)\s+"([^"]*)"|rom\s*\(((?:[^()"]|"[^"]*")*)\))', re.IGNORECASE)
+# All fields of a rom entry in a single pass: (key, quoted value, bare value)
+_CMP_ROM_FIELD_RE = re.compile(r'\b(name|size|crc|md5|sha1)\s+(?:"([^"]*)"|([^\s"]+))', re.IGNORECASE)
+
+# Bytes read from the start of a file to detect its format
+HEAD_BYTES = 512
+
+# Columns that hold a single value per DAT file (filled in bulk, not per row)
+FILE_COLUMNS = ("dat_filename", "platform", "system")
+
+def new_rom_columns() -> Dict[str, list]:
+    """
+    Returns an empty column-oriented (Struct-of-Arrays) ROM batch: one list per 'roms' column.
+    Columnar batches go straight into Arrow/DuckDB without a row -> column transpose.
+    """
+    return {name: [] for name in ROM_COLUMNS}
 
 class DatFileParser:
     """
     Handles parsing of TOSEC DAT files in both XML and legacy CMP formats.
+    With dedupe_descriptions, a description identical to its game name (most TOSEC games) is stored as None/NULL.
     """
-    def __init__(self):
+    def __init__(self, dedupe_descriptions: bool = False):
         
-        # Compile header pattern to identify CMP files for once for performance
-        self._cmp_header_pattern = re.compile(r'clrmamepro\s*\(', re.IGNORECASE)
-        # Cmp parsing patterns
-        self._game_pattern = re.compile(r'game\s*\(', re.IGNORECASE)
-        self._name_pat = re.compile(r'name\s+"(.*?)"', re.IGNORECASE)
-        self._desc_pat = re.compile(r'description\s+"(.*?)"', re.IGNORECASE)
-        self._rom_pat = re.compile(r'rom\s*\(\s*(.*?)\s*\)', re.DOTALL | re.IGNORECASE)
-        self._rom_name_pat = re.compile(r'name\s+"(.*?)"', re.IGNORECASE)
-        self._size_pat = re.compile(r'size\s+(\d+)', re.IGNORECASE)
-        self._crc_pat = re.compile(r'crc\s+([0-9a-fA-F]+)', re.IGNORECASE)
-        self._md5_pat = re.compile(r'md5\s+([0-9a-fA-F]+)', re.IGNORECASE)
-        self._sha1_pat = re.compile(r'sha1\s+([0-9a-fA-F]+)', re.IGNORECASE)
-
-    def parse(self, file_path: str) -> List[Tuple]:
-        """Auto-detects format and parses the file."""
-        if self._is_cmp_file(file_path):
-            return self._parse_cmp(file_path)
-        return self._parse_xml(file_path)
-
-    def _is_cmp_file(self, file_path: str) -> bool:
+        self.dedupe_descriptions = dedupe_descriptions
         
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                head = f.read(500)
-                return "clrmamepro" in head.lower() or "rom (" in head.lower()
-        except:
-            return False
+    def parse(self, file_path: str) -> Dict[str, list]:
+        """
+        Auto-detects format and parses the file into a columnar ROM batch.
+        Raises ValueError right away for files that are neither XML nor CMP (junk named .dat),
+        instead of feeding them to a full parser. Malformed or unreadable files raise as well,
+        the caller decides how to report them (workers have no logging of their own).
+        """
+        # One open per file: the head is sniffed and the same handle is rewound for the parser
+        with open(file_path, 'rb') as dat_file:
+            head = dat_file.read(HEAD_BYTES).decode('utf-8', errors='ignore')
+            dat_file.seek(0)
+            
+            # Markup first: an XML head may contain CMP markers too
+            # (a Logiqx <clrmamepro/> header element, "rom (" inside a name)
+            if head.lstrip("\ufeff \t\r\n").startswith("<"):
+                return self._parse_xml(file_path, dat_file)
+            if self._is_cmp_head(head):
+                return self._parse_cmp(file_path, dat_file)
+        
+        raise ValueError("Unknown DAT format (neither XML nor ClrMamePro)")
 
-    def _get_common_info(self, file_path: str) -> Tuple[str, str, str]:
+    def _is_cmp_head(self, head: str) -> bool:
         
-        dat_filename = os.path.basename(file_path)
-        try:
-            system_name = os.path.basename(os.path.dirname(file_path))
-        except:
-            system_name = "Unknown"
+        head = head.lower()
+        return "clrmamepro" in head or "rom (" in head
+
+    def _get_common_info(self, file_path: str) -> Tuple[str, str, str]:
         
+        # One split for both names; string-only path functions, nothing here can fail
+        directory, dat_filename = os.path.split(file_path)
+        system_name = os.path.basename(directory)
+
         # Extract platform name from the filename
         platform = dat_filename.split(' - ')[0]
         return dat_filename, platform, system_name
 
-    def _parse_xml(self, file_path: str) -> List[Tuple]:
+    def _fill_file_columns(self, columns: Dict[str, list], file_path: str) -> Dict[str, list]:
+        """Fills the per-file constant columns once the per-ROM columns are complete."""
+        count = len(columns["rom_name"])
+        for name, value in zip(FILE_COLUMNS, self._get_common_info(file_path)):
+            columns[name] = [value] * count
+            
+        return columns
+
+    def _parse_xml(self, file_path: str, dat_file: Optional[BinaryIO] = None) -> Dict[str, list]:
         
-        rows = []
-        dat_filename, platform, system_name = self._get_common_info(file_path)
+        columns = new_rom_columns()
+        game_names, descriptions, rom_names, sizes, crcs, md5s, sha1s, statuses = (
+            columns[name] for name in ("game_name", "description", "rom_name", "size", "crc", "md5", "sha1", "status"))
         
+        dedupe = self.dedupe_descriptions
+        # lxml walks the children lazily in C; ElementTree has no iterchildren, findall is its direct-child lookup
+        use_lxml = lxml_etree is not None
         try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-            
-            for game in root.findall('game'):
+            for game in self._iter_xml_games(dat_file if dat_file is not None else file_path):
                 game_name = game.get('name')
-                desc_node = game.find('description')
-                description = desc_node.text if desc_node is not None else ""
-                
-                for rom in game.findall('rom'):
-                    rows.append((
-                        dat_filename, platform, game_name, description,
-                        rom.get('name'), rom.get('size'), rom.get('crc'), 
-                        rom.get('md5'), rom.get('sha1'), rom.get('status', 'good'), 
-                        system_name
-                    ))
+                description = game.findtext('description', '')
+                if dedupe and description == game_name:
+                    description = None
+
+                for rom in (game.iterchildren('rom') if use_lxml else game.findall('rom')):
+                    # One attribute mapping per rom (a plain dict under ElementTree) instead of a method call per field
+                    attrs = rom.attrib
+                    # Sizes are stored as BIGINT, convert here (in the worker) so batches carry a single type.
+                    # A malformed size becomes NULL instead of failing the whole file.
+                    size = attrs.get('size')
+                    game_names.append(game_name)
+                    descriptions.append(description)
+                    rom_names.append(attrs.get('name'))
+                    sizes.append(int(size) if size and size.isdecimal() else None)
+                    crcs.append(attrs.get('crc'))
+                    md5s.append(attrs.get('md5'))
+                    sha1s.append(attrs.get('sha1'))
+                    # A handful of distinct values: interned, they are shared in memory and pickled once per batch
+                    statuses.append(sys.intern(attrs.get('status', 'good')))
                     
-        except Exception as error:
-            logging.error(f"FAILED (XML): {file_path} -> {error}")
+        except _XML_ERRORS as error:
+            # Plain ValueError: lxml's error type cannot be pickled back from a worker process
+            raise ValueError(f"Malformed XML: {error}") from None
             
-        return rows
+        return self._fill_file_columns(columns, file_path)
 
-    def _parse_cmp(self, file_path: str) -> List[Tuple]:
+    def _iter_xml_games(self, source: Union[str, BinaryIO]):
+        """
+        Streams the <game> elements of an XML DAT (path or binary file object), releasing each one after the caller is done with it.
+        Uses lxml when installed (its tag filter skips every other element in C), ElementTree otherwise.
+        """
+        if lxml_etree is not None:
+            for _, game in lxml_etree.iterparse(source, events=("end",), tag="game", **_LXML_OPTIONS):
+                yield game
+                # Free the game and drop the empty siblings lxml keeps under the root
+                game.clear(keep_tail=True)
+                while game.getprevious() is not None:
+                    del game.getparent()[0]
+            return
         
-        rows = []
-        dat_filename, platform, system_name = self._get_common_info(file_path)
-
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                content = f.read()
-                
-        except Exception as error:
-            logging.error(f"FAILED (Read CMP): {file_path} -> {error}")
-            return []
+        # Stream the file instead of building the whole tree (bounded memory on huge DATs)
+        context = ET.iterparse(source, events=("start", "end"))
+        _, root = next(context)
+        
+        for event, game in context:
+            if event != "end" or game.tag != 'game':
+                continue
+            yield game
+            # Release the processed game (and any earlier siblings) from the tree
+            root.clear()
 
-        # --- CMP Parsing Logic (Bracket Counter) ---
-        game_blocks = []
-        iterator = self._game_pattern.finditer(content)
+    def _parse_cmp(self, file_path: str, dat_file: Optional[BinaryIO] = None) -> Dict[str, list]:
         
-        for match in iterator:
-            start_idx = match.end()
-            current_idx = start_idx
-            balance = 1
-            
-            while balance > 0 and current_idx < len(content):
-                char = content[current_idx]
-                if char == '(': balance += 1
-                elif char == ')': balance -= 1
-                current_idx += 1
-                
-            if balance == 0:
-                game_blocks.append(content[start_idx : current_idx - 1])
+        if dat_file is None:
+            with open(file_path, 'rb') as dat_file:
+                return self._parse_cmp(file_path, dat_file)
+        
+        columns = new_rom_columns()
+        game_names, descriptions, rom_names, sizes, crcs, md5s, sha1s, statuses = (
+            columns[name] for name in ("game_name", "description", "rom_name", "size", "crc", "md5", "sha1", "status"))
 
-        for block in game_blocks:
-            g_name_match = self._name_pat.search(block)
-            g_desc_match = self._desc_pat.search(block)
-            
-            game_name = g_name_match.group(1) if g_name_match else "Unknown"
-            description = g_desc_match.group(1) if g_desc_match else ""
+        content = dat_file.read().decode('utf-8', errors='replace')
 
-            for rom_match in self._rom_pat.finditer(block):
-                rom_data = rom_match.group(1)
-                r_name = self._rom_name_pat.search(rom_data)
+        dedupe = self.dedupe_descriptions
+        # --- CMP Parsing Logic: the regex engine delimits game blocks, no Python-level bracket counting ---
+        for game_match in _CMP_GAME_RE.finditer(content):
+            game_name, description = "Unknown", ""
+            seen_name = seen_description = False
+            
+            for key, value, rom_body in _CMP_GAME_ENTRY_RE.findall(game_match.group(1)):
+                if not rom_body:
+                    # Game-level fields come before the roms, the first occurrence wins
+                    key = key.lower()
+                    if key == "name" and not seen_name:
+                        game_name, seen_name = value, True
+                    elif key == "description" and not seen_description:
+                        description, seen_description = value, True
+                    continue
+                
+                if dedupe and description == game_name:
+                    description = None
                 
-                if r_name:
-                    r_size = self._size_pat.search(rom_data)
-                    r_crc = self._crc_pat.search(rom_data)
-                    r_md5 = self._md5_pat.search(rom_data)
-                    r_sha1 = self._sha1_pat.search(rom_data)
-
-                    rows.append((dat_filename, platform, game_name, description,
-                                r_name.group(1),
-                                int(r_size.group(1)) if r_size else 0,
-                                r_crc.group(1) if r_crc else "",
-                                r_md5.group(1) if r_md5 else "",
-                                r_sha1.group(1) if r_sha1 else "",
-                                "good",
-                                system_name
-                    ))
-        return rows
+                fields = {}
+                for field, quoted, bare in _CMP_ROM_FIELD_RE.findall(rom_body):
+                    fields.setdefault(field.lower(), quoted or bare)
+                
+                rom_name = fields.get("name")
+                if rom_name:
+                    size = fields.get("size", "")
+                    game_names.append(game_name)
+                    descriptions.append(description)
+                    rom_names.append(rom_name)
+                    sizes.append(int(size) if size.isdecimal() else 0)
+                    crcs.append(fields.get("crc", ""))
+                    md5s.append(fields.get("md5", ""))
+                    sha1s.append(fields.get("sha1", ""))
+                    statuses.append("good")
+                    
+        return self._fill_file_columns(columns, file_path)
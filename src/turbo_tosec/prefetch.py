@@ -0,0 +1,76 @@
+import os
+import threading
+from typing import List
+
+def warm_file(file_path: str):
+    """
+    Asks the OS to load a file into the page cache without copying it into Python.
+    Errors are ignored on purpose: this is only a hint, the real read reports failures.
+    """
+    try:
+        fd = os.open(file_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    except OSError:
+        return
+
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        else:
+            # No fadvise (Windows): a plain sequential read warms the system cache
+            while os.read(fd, 1024 * 1024):
+                pass
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class FilePrefetcher:
+    """
+    Warms the page cache for the next files in the queue from a single background thread,
+    so parser workers find their DAT data in memory instead of waiting on disk.
+    Stays at most 'depth' files ahead of the consumer to avoid evicting useful cache.
+    """
+    def __init__(self, files: List[str], depth: int = 32):
+
+        self.files = files
+        self.depth = depth
+        self._consumed = 0
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        self.stop()
+
+    def start(self):
+        """Starts the background prefetch thread."""
+        self._thread.start()
+
+    def stop(self):
+        """Stops prefetching and waits for the thread to exit."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+
+    def advance(self, count: int = 1):
+        """Signals that the consumer finished 'count' more files."""
+        with self._cond:
+            self._consumed += count
+            self._cond.notify()
+
+    def _run(self):
+
+        for index, file_path in enumerate(self.files):
+            with self._cond:
+                while not self._stopped and index >= self._consumed + self.depth:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+            warm_file(file_path)
@@ -1,112 +1,211 @@
-import os
 from typing import List, Tuple
-import threading
+import gc
 import concurrent.futures
-import time
+import itertools
+from operator import itemgetter
 from tqdm import tqdm
 import logging
 
 from turbo_tosec.database import DatabaseManager
-from turbo_tosec.parser import DatFileParser
+from turbo_tosec.parser import DatFileParser, new_rom_columns
+from turbo_tosec.prefetch import FilePrefetcher
+from turbo_tosec.writer import BatchWriter
 
-def get_dat_files(root_dir: str) -> List[str]:
+# Flush the buffer early when the parsed DAT data behind it grows past this size,
+# so a few huge DATs cannot blow up memory before the row threshold is reached.
+FLUSH_THRESHOLD_BYTES = 16 * 1024 * 1024
+# How many files the optional prefetcher may read ahead of the parsers
+PREFETCH_DEPTH = 32
+# Below this many files (e.g. a resume with a handful left) the prefetch thread costs more than it hides
+PREFETCH_MIN_FILES = 16
+# Flushed batches that may wait for the background writer (each one is at most ~FLUSH_THRESHOLD_BYTES of DATs)
+WRITE_QUEUE_DEPTH = 2
+# Flushed batches are committed together once this many rows are pending. Transactions of this size skip
+# the WAL (written straight into the table); a crash re-imports at most this many rows' files on resume.
+COMMIT_EVERY_ROWS = 500_000
+# Upper bound of DAT files handed to a worker per task (amortizes IPC without coarse progress steps)
+MAX_FILES_PER_TASK = 16
+# Files smaller than this cannot hold a single game entry, they are skipped without parsing
+MIN_DAT_BYTES = 32
+
+# Process-local parser used by pool workers (created once per process by _init_parser)
+_worker_parser = None
+
+def _init_parser(dedupe_descriptions: bool = False):
+    
+    global _worker_parser
+    _worker_parser = DatFileParser(dedupe_descriptions)
+    # Forked workers inherit the parent's paused GC (see ImportSession.run); they never flush, so turn it back on
+    gc.enable()
+
+def _parse_chunk(file_paths: List[str]) -> list:
     """
-    Finds all .dat files in the specified directory and its subdirectories.
+    Parses several DAT files inside a worker process in a single task.
+    Failures are returned in place of the file's result (not raised) so one bad file does not sink its chunk,
+    and are logged by the parent process: workers never log.
     """
-    dat_files = []
-    for root, _, files in os.walk(root_dir):
-        for file in files:
-            if file.lower().endswith(".dat"):
-                dat_files.append(os.path.join(root, file))
-                
-    return dat_files
+    results = []
+    for file_path in file_paths:
+        try:
+            results.append(_worker_parser.parse(file_path))
+        except Exception as error:
+            # Without its traceback the error does not keep this frame (and the parsed results) alive
+            results.append(error.with_traceback(None))
+            
+    return results
+
+def _make_chunks(files: List[Tuple[str, int]], workers: int) -> List[List[Tuple[str, int]]]:
+    """
+    Splits (path, size) pairs into worker tasks, largest DATs first (LPT scheduling): a huge file
+    picked up last would keep one worker busy while the others sit idle. Sizes are cached, no extra stat.
+    The size-sorted files are dealt out round-robin, so every task gets one of the largest files plus
+    smaller ones instead of the biggest files landing back to back in the same task.
+    """
+    # Small chunks: one pickle round-trip per chunk instead of per file, without coarse progress steps
+    chunk_size = max(1, min(len(files) // (workers * 4), MAX_FILES_PER_TASK))
+    chunk_count = -(-len(files) // chunk_size)
+    files = sorted(files, key=itemgetter(1), reverse=True)
+    
+    return [files[i::chunk_count] for i in range(chunk_count)]
 
 class ImportSession:
     """
     Orchestrates the scanning, parsing, and database insertion workflow.
     """
-    def __init__(self, args, db_manager: DatabaseManager, all_files: List[str]):
+    def __init__(self, args, db_manager: DatabaseManager, all_files: List[Tuple[str, int]]):
         
         self.args = args
+        # Cached once: read on every parsed file in the hot path
+        self._batch_size = args.batch_size
+        self._workers = args.workers
         self.db = db_manager
-        self.parser = DatFileParser()
-        self.buffer = []
+        self.parser = DatFileParser(args.dedupe_descriptions)
+        # Columnar (SoA) buffer: one list per 'roms' column
+        self.buffer = new_rom_columns()
+        self.buffer_rows = 0
+        self.buffer_bytes = 0
+        # Files whose rows are in the buffer, committed together with them
+        self.processed_files_buffer = []
         self.total_roms = 0
         self.error_count = 0
         self.all_files = all_files
+        self.prefetcher = None
+        self.writer = None
 
-    def run(self, files_to_process: List[str]):
+    def run(self, files_to_process: List[Tuple[str, int]]):
         """
         Executes the import process.
+        Files are (path, size) pairs as returned by get_dat_files, sizes are reused for the progress bar.
         """
-        print("Calculating total size for progress bar...")
-        total_bytes = sum(os.path.getsize(f) for f in self.all_files)
-        remaining_bytes = sum(os.path.getsize(f) for f in files_to_process)
+        total_bytes = sum(size for _, size in self.all_files)
+        remaining_bytes = sum(size for _, size in files_to_process)
         initial_bytes = total_bytes - remaining_bytes
-        print(f"Starting import with {self.args.workers} worker(s)...")
+        tqdm.write(f"Starting import with {self._workers} worker(s)...")
 
         try:
-            with tqdm(total=total_bytes, initial=initial_bytes, unit='B', unit_scale=True, unit_divisor=1024) as pbar:
-                # Monitör Thread
-                stop_monitor = threading.Event()
-                def monitor_progress():
-                    while not stop_monitor.is_set():
-                        time.sleep(1)
-                        pbar.refresh()
-                
-                monitor_thread = threading.Thread(target=monitor_progress, daemon=True)
-                monitor_thread.start()
+            # Batches are inserted by a background thread while the next ones are parsed
+            with BatchWriter(self.db, WRITE_QUEUE_DEPTH, COMMIT_EVERY_ROWS) as self.writer:
+                # tqdm rate-limits its own redraws (at most once per second), no refresh thread needed
+                with tqdm(total=total_bytes, initial=initial_bytes, unit='B', unit_scale=True, unit_divisor=1024,
+                          mininterval=1.0, miniters=1, smoothing=0.1) as pbar:
+
+                    files_to_process = self._skip_junk_files(files_to_process, pbar)
+
+                    chunks = None
+                    if self._workers > 1:
+                        chunks = _make_chunks(files_to_process, self._workers)
+                        # The prefetcher must follow the order in which files are submitted to the workers
+                        files_to_process = [item for chunk in chunks for item in chunk]
+
+                    if self.args.prefetch and len(files_to_process) >= PREFETCH_MIN_FILES:
+                        self.prefetcher = FilePrefetcher([path for path, _ in files_to_process], PREFETCH_DEPTH)
+                        self.prefetcher.start()
 
-                # Start workers
-                if self.args.workers < 2:
-                    self._run_serial(files_to_process, pbar)
-                else:
-                    self._run_parallel(files_to_process, pbar)
+                    # The hot loop only creates acyclic lists/strings, so the cyclic GC just burns time
+                    # re-scanning the buffer. Pause it and collect once per flush instead.
+                    gc.disable()
 
-                stop_monitor.set()
-                monitor_thread.join()
+                    # Start workers
+                    try:
+                        if self._workers < 2:
+                            self._run_serial(files_to_process, pbar)
+                        else:
+                            self._run_parallel(chunks, pbar)
+                    finally:
+                        gc.enable()
+                        if self.prefetcher:
+                            self.prefetcher.stop()
 
-            self._flush_buffer() # Write any remaining data
+                self._flush_buffer() # Write any remaining data
 
         except KeyboardInterrupt:
-            print("\nInterrupted.")
+            tqdm.write("\nInterrupted.")
         except Exception as error:
-            print(f"\nCritical Error: {error}")
+            tqdm.write(f"\nCritical Error: {error}")
+
+        if self.writer:
+            # The progress bar counts rows handed to the writer; rows of a rolled-back group never reached the DB
+            self.total_roms = self.writer.committed_rows
 
         return self.total_roms, self.error_count
 
+    def _skip_junk_files(self, files: List[Tuple[str, int]], pbar) -> List[Tuple[str, int]]:
+        """
+        Filters out files too small to be a DAT using the cached sizes (no I/O).
+        They are counted as errors and logged, but never reach a parser.
+        """
+        valid_files = []
+        for file_path, file_size in files:
+            if file_size < MIN_DAT_BYTES:
+                self.error_count += 1
+                logging.error(f"Skipped (too small to be a DAT, {file_size} bytes): {file_path}")
+                pbar.update(file_size)
+            else:
+                valid_files.append((file_path, file_size))
+                
+        return valid_files
+
     def _flush_buffer(self):
-        if self.buffer:
-            self.db.insert_batch(self.buffer)
-            self.total_roms += len(self.buffer)
-            self.buffer.clear()
+        if self.buffer_rows:
+            # The writer owns the submitted lists from now on, start new ones instead of clearing
+            self.writer.submit(self.buffer, self.processed_files_buffer)
+            self.total_roms += self.buffer_rows
+            self.buffer = new_rom_columns()
+            self.processed_files_buffer = []
+            self.buffer_rows = 0
+            if not gc.isenabled():
+                gc.collect()
+        self.buffer_bytes = 0
 
-    def _process_result(self, data, file_path, pbar):
+    def _process_result(self, data, file_size: int, pbar):
         """
         Common logic for handling a parsed file result.
         """
-        if data:
-            self.buffer.extend(data)
-            if len(self.buffer) >= self.args.batch_size:
+        rows = len(data["rom_name"]) if data else 0
+        if rows:
+            for name, column in self.buffer.items():
+                column.extend(data[name])
+            self.buffer_rows += rows
+            self.processed_files_buffer.append(data["dat_filename"][0])
+            # The DAT file size is a free estimate of the memory held by its parsed rows
+            self.buffer_bytes += file_size
+            if self.buffer_rows >= self._batch_size or self.buffer_bytes >= FLUSH_THRESHOLD_BYTES:
                 self._flush_buffer()
         
-        # Update stats
+        # Update stats. No forced redraw per file: update() below redraws at most once per mininterval
         stats = {"ROMs": self.total_roms}
         if self.error_count > 0:
             stats["Errors"] = self.error_count
-        pbar.set_postfix(stats)
-        
-        try:
-            pbar.update(os.path.getsize(file_path))
-        except:
-            pbar.update(0)
+        pbar.set_postfix(stats, refresh=False)
+        pbar.update(file_size)
 
     def _run_serial(self, files, pbar):
         
-        for file_path in files:
+        for file_path, file_size in files:
+            if self.prefetcher:
+                self.prefetcher.advance()
             try:
                 data = self.parser.parse(file_path)
-                self._process_result(data, file_path, pbar)
                 
             except Exception as error:
                 error_msg = str(error).lower()
@@ -116,26 +215,66 @@ class ImportSession:
                 
                 self.error_count += 1
                 logging.error(f"Failed (Serial): {file_path} -> {error}")
+                continue
+            
+            # Outside the per-file handler: a failed background write aborts the import, it is not this file's fault
+            self._process_result(data, file_size, pbar)
+
+    def _submit_chunk(self, executor, pending: dict, chunk: List[Tuple[str, int]]):
+        
+        pending[executor.submit(_parse_chunk, [path for path, _ in chunk])] = chunk
+        # Workers open a chunk's files as soon as it is queued: the prefetcher must run ahead of
+        # submission, not of consumed results (it would only warm files that were already parsed)
+        if self.prefetcher:
+            self.prefetcher.advance(len(chunk))
 
-    def _run_parallel(self, files, pbar):
+    def _run_parallel(self, chunks, pbar):
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.args.workers) as executor:
-            # parser.parse method is thread-safe (stateless)
-            future_to_file = {executor.submit(self.parser.parse, f): f for f in files}
+        # Chunks as planned by _make_chunks, submitted in order
+        chunks = iter(chunks)
+        
+        # Only a small window of chunks is in flight at once, so memory stays O(workers) parsed chunks
+        # instead of holding a future (and its result) for every file of the collection.
+        max_pending = 2 * self._workers
+        
+        # Parsing is CPU-bound, worker processes sidestep the GIL. Results are plain lists (cheap to pickle).
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self._workers, initializer=_init_parser,
+                                                    initargs=(self.args.dedupe_descriptions, )) as executor:
+            pending = {}
+            for chunk in itertools.islice(chunks, max_pending):
+                self._submit_chunk(executor, pending, chunk)
             
-            for future in concurrent.futures.as_completed(future_to_file):
-                file_path = future_to_file[future]
-                try:
-                    data = future.result()
-                    self._process_result(data, file_path, pbar)
-                    
-                except Exception as error:
-                    error_msg = str(error).lower()
-                    # If disk is full or read-only, stop the program
-                    if "not enough space" in error_msg or "read-only file system" in error_msg:
-                        # Try to shut down the thread pool immediately
-                        executor.shutdown(wait=False, cancel_futures=True)
-                        raise OSError("CRITICAL: Disk is full or not writable!") from error
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                finished = [(future, pending.pop(future)) for future in done]
+                
+                # Refill the window first, so workers keep parsing while results are written
+                for chunk in itertools.islice(chunks, len(finished)):
+                    self._submit_chunk(executor, pending, chunk)
                 
-                    self.error_count += 1
-                    logging.error(f"Failed: {file_path} -> {error}")
\ No newline at end of file
+                for future, chunk in finished:
+                    try:
+                        results = future.result()
+                    except Exception as error:
+                        # The whole task failed (e.g. a crashed worker): report it for every file of the chunk
+                        results = [error] * len(chunk)
+                        
+                    for (file_path, file_size), data in zip(chunk, results):
+                        if isinstance(data, Exception):
+                            error_msg = str(data).lower()
+                            # If disk is full or read-only, stop the program
+                            if "not enough space" in error_msg or "read-only file system" in error_msg:
+                                # Try to shut down the process pool immediately
+                                executor.shutdown(wait=False, cancel_futures=True)
+                                raise OSError("CRITICAL: Disk is full or not writable!") from data
+                        
+                            self.error_count += 1
+                            logging.error(f"Failed: {file_path} -> {data}")
+                            continue
+                        
+                        try:
+                            self._process_result(data, file_size, pbar)
+                        except Exception:
+                            # A failed background write aborts the import: stop the workers instead of parsing the rest
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            raise
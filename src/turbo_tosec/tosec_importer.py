@@ -3,24 +3,28 @@ Turbo-TOSEC: High-Performance TOSEC DAT Importer
 ================================================
 
 This module parses TOSEC DAT files (XML format) and imports them into a DuckDB database.
-It is designed to handle massive collections efficiently using multi-threading.
+It is designed to handle massive collections efficiently using multi-processing.
 
 Architecture & Concurrency Design
 ---------------------------------
 The importer uses a "Producer-Consumer" pattern adapted for DuckDB's single-writer constraint:
 
 1.  **Workers (Producers):**
-    - Managed by a `ThreadPoolExecutor`.
+    - Managed by a `ProcessPoolExecutor` (parsing is CPU-bound, processes are not limited by the GIL).
     - Responsible for I/O (reading files) and CPU (parsing XML) tasks.
-    - They do NOT write to the database. They return parsed tuples to the main thread.
-    - This ensures thread-safety without complex locking mechanisms.
+    - They do NOT write to the database. They return parsed columns (one list per field) to the main process.
+    - Files are sent in chunks (largest DATs first), one pickle round-trip per chunk.
 
-2.  **Main Thread (Consumer & Writer):**
-    - Submits tasks to workers.
-    - Collects results as they complete (`as_completed`).
-    - Buffers results and performs batched inserts (`executemany`) into DuckDB.
+2.  **Main Thread (Consumer):**
+    - Keeps a small sliding window of chunk tasks in flight and refills it as chunks complete.
+    - Buffers results column-wise and hands full batches to the writer thread.
     - Updates the progress bar (`tqdm`).
 
+3.  **Writer Thread (`BatchWriter`):**
+    - The only thread that writes to DuckDB while an import runs (single-writer, serialized by a lock).
+    - Performs batched Arrow inserts from a bounded queue, so parsing continues during inserts.
+    - Commits batches together in large transactions; each file is marked processed in the same transaction as its rows.
+
 Error Handling Strategy
 -----------------------
 - **Console:** Kept clean for the progress bar. Only critical crashes are printed
@@ -41,22 +45,31 @@ from datetime import datetime
 import time
 import argparse
 import logging
+import logging.handlers
 import subprocess
 import platform
+import multiprocessing
 
 from turbo_tosec.database import DatabaseManager
 from turbo_tosec.session import ImportSession
 from turbo_tosec.utils import get_dat_files
 from turbo_tosec._version import __version__
 
+# Example pattern: TOSEC-v2023-08-15
+_TOSEC_VERSION_RE = re.compile(r"TOSEC-v\d{4}-\d{2}-\d{2}", re.IGNORECASE)
+
 def setup_logging(log_file: str):
    
     for handler in logging.root.handlers[:]:
         logging.root.removeHandler(handler)
 
+    file_handler = logging.FileHandler(log_file, mode='w', encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+    
+    # Errors are buffered in memory and written in bulk (every 1024 records or on shutdown),
+    # so a corrupt-heavy import does not pay a locked write + flush for every failed file.
     logging.basicConfig(level=logging.ERROR, 
-            format="%(asctime)s [%(levelname)s] %(message)s",
-            handlers=[logging.FileHandler(log_file, mode='w', encoding='utf-8')]
+            handlers=[logging.handlers.MemoryHandler(capacity=1024, flushLevel=logging.CRITICAL, target=file_handler)]
     )
 
 def open_file_with_default_app(filepath):
@@ -72,10 +85,10 @@ def open_file_with_default_app(filepath):
         print(f"\nCould not open log file automatically: {e}")
         
 def extract_tosec_version(path: str) -> str:
-    # Example pattern: TOSEC-v2023-08-15
-    match = re.search(r"(TOSEC-v\d{4}-\d{2}-\d{2})", path, re.IGNORECASE)
+    
+    match = _TOSEC_VERSION_RE.search(path)
     if match:
-        return match.group(1)
+        return match.group(0)
     return "Unknown"
 
 def run_scan_mode(args, log_filename: str):
@@ -102,8 +115,15 @@ def run_scan_mode(args, log_filename: str):
     # Database Context Manager for safe handling (auto connect/close)
     with DatabaseManager(args.output) as db:
         
+        # DuckDB's internal parallelism (compression, row-group writes) is independent of the parser workers:
+        # narrow TOSEC rows benefit from every core. Safe mode (1 worker) keeps DuckDB single-threaded too.
+        # Applied first: an invalid setting (e.g. --db-memory 4XB) must fail before anything is wiped.
+        db_threads = args.db_threads or (os.cpu_count() if args.workers > 1 else 1)
+        db.configure_bulk_load(db_threads, args.db_memory)
+        
         # Resume / Wipe Decision Logic
         resume_mode = False
+        processed_files = set()
         db_version = db.get_metadata_value('tosec_version')
         
         # A. Version Mismatch Check
@@ -142,10 +162,10 @@ def run_scan_mode(args, log_filename: str):
             db.set_metadata_value('tosec_version', current_version)
             files_to_process = all_dat_files
         else:
-            # Resume from last state
+            # Resume from last state (reuses the processed set fetched above)
             print("Calculating resume list...")
-            processed_set = db.get_processed_files()
-            files_to_process = [f for f in all_dat_files if os.path.basename(f) not in processed_set]
+            # rpartition is a single C-level call, cheaper than os.path.basename on huge collections
+            files_to_process = [(f, size) for f, size in all_dat_files if f.rpartition(os.sep)[2] not in processed_files]
             
             skipped = len(all_dat_files) - len(files_to_process)
             print(f"Resuming: {skipped} files skipped. {len(files_to_process)} remaining.")
@@ -154,25 +174,26 @@ def run_scan_mode(args, log_filename: str):
             print("Nothing to do. All files processed.")
             return
 
-        db.configure_threads(args.workers)
-        
         session = ImportSession(args, db, all_dat_files)
         total_roms, error_count = session.run(files_to_process)
 
     end_time = time.time()
     duration = end_time - start_time
     
-    print("\nTransaction completed!")
-    print(f"Database: {args.output}")
-    print(f"Total ROMs: {total_roms:,}")
-    print(f"Elapsed Time: {duration:.2f}s")
+    # One write for the whole summary block
+    print(f"\nTransaction completed!\n"
+          f"Database: {args.output}\n"
+          f"Total ROMs: {total_roms:,}\n"
+          f"Elapsed Time: {duration:.2f}s")
+    
+    # Write out any buffered log records before the log file is opened or removed
+    logging.shutdown()
     
     if error_count > 0:
         print(f"\nWARNING: {error_count} files failed.")
         if args.open_log: 
             open_file_with_default_app(log_filename)
     else:
-        logging.shutdown()
         if os.path.exists(log_filename): 
             try: os.remove(log_filename)
             except: pass
@@ -209,8 +230,12 @@ def main():
     parser_scan = subparsers.add_parser("scan", help="Scan DAT files and import to DB (Default mode).")
     parser_scan.add_argument("--input", "-i", required=True, help="The main directory path where the TOSEC DAT files are located.")
     parser_scan.add_argument("--output", "-o", default="tosec.duckdb", help="Name/path of the DuckDB file to be created.")
-    parser_scan.add_argument("--workers", "-w", type=int, default=1, help="Number of worker threads (Default: 1). Tip: Use 0 to auto-detect CPU count.")
-    parser_scan.add_argument("--batch-size", "-b", type=int, default=1000, help="Number of rows to insert per batch transaction (Default: 1000).")
+    parser_scan.add_argument("--workers", "-w", type=int, default=1, help="Number of worker processes (Default: 1). Tip: Use 0 to auto-detect CPU count.")
+    parser_scan.add_argument("--batch-size", "-b", type=int, default=50000, help="Number of rows buffered before a batch is handed to the database writer (Default: 50000). Batches are also flushed early once ~16 MB of DAT data is buffered, and are committed together every ~500k rows.")
+    parser_scan.add_argument("--db-threads", type=int, default=None, help="DuckDB engine threads during import (Default: all cores with --workers > 1, otherwise 1).")
+    parser_scan.add_argument("--db-memory", default=None, help="DuckDB memory limit during import, e.g. '4GB' (Default: DuckDB's own limit, 80%% of RAM).")
+    parser_scan.add_argument("--dedupe-descriptions", action="store_true", help="Store NULL as the description when it repeats the game name (smaller database; query with COALESCE(description, game_name)).")
+    parser_scan.add_argument("--prefetch", action="store_true", help="Warm the OS file cache for upcoming DAT files in a background thread (helps on cold caches and HDDs).")
     parser_scan.add_argument("--resume", action="store_true", help="Automatically resume if database exists (skip prompt).")
     parser_scan.add_argument("--force-new", action="store_true", help="Force overwrite existing database (skip prompt).")
     parser_scan.add_argument("--no-open-log", action="store_false", dest="open_log", default=True, help="Do NOT automatically open the log file if errors occur.")
@@ -270,9 +295,9 @@ def main():
             
         elif args.command == "scan":
             if args.workers > 4:
-                print(f"  WARNING: Using {args.workers} threads.")
+                print(f"  WARNING: Using {args.workers} workers.")
                 print("   If you are using a mechanical HDD, performance may drop due to seek time.")
-                print("   Recommended for HDD: 1-4 threads. Recommended for SSD: 4-16 threads.")
+                print("   Recommended for HDD: 1-4 workers. Recommended for SSD: 4-16 workers.")
             if not args.input:
                 parser.error("the following arguments are required: --input/-i")
                 
@@ -313,4 +338,6 @@ def main():
         
 if __name__ == "__main__":
     
+    # Required for worker processes in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()
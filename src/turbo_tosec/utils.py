@@ -1,12 +1,31 @@
 import os
-from typing import List
+import logging
+from typing import List, Tuple
 
-def get_dat_files(root_dir: str) -> List[str]:
-    
+def get_dat_files(root_dir: str) -> List[Tuple[str, int]]:
+    """
+    Recursively finds all .dat files under root_dir.
+    Returns (path, size) pairs so callers never need to stat the files again.
+    """
     dat_files = []
+    stack = [root_dir]
     
-    for root, _, files in os.walk(root_dir):
-        for file in files:
-            if file.lower().endswith(".dat"):
-                dat_files.append(os.path.join(root, file))
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    # Lower-case only the 4-char suffix, not every (often long) TOSEC file name
+                    elif entry.name[-4:].lower() == ".dat":
+                        # One unreadable entry (e.g. a dangling symlink) must not end the scan of its directory
+                        try:
+                            dat_files.append((entry.path, entry.stat().st_size))
+                        except OSError as error:
+                            logging.error(f"Cannot read file: {entry.path} -> {error}")
+                        
+        except OSError as error:
+            logging.error(f"Cannot scan directory: {directory} -> {error}")
+            
     return dat_files
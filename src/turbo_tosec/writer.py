@@ -0,0 +1,85 @@
+import queue
+import threading
+from typing import Dict, List
+
+from turbo_tosec.database import DatabaseManager
+
+class BatchWriter:
+    """
+    Writes flushed ROM batches to DuckDB from a single background thread,
+    so parsing continues while a batch is being inserted (DuckDB releases the GIL while it works).
+    The queue holds at most 'depth' batches: a slow disk makes the producer wait instead of growing memory.
+    DuckDB stays single-writer, only this thread writes while the writer is running.
+    With 'commit_rows', batches are grouped into one transaction until that many rows are pending:
+    large transactions are written straight into the table instead of going through the WAL.
+    'committed_rows' counts only rows that are committed, a failed group rolls back uncounted.
+    """
+    def __init__(self, db: DatabaseManager, depth: int = 2, commit_rows: int = 0):
+
+        self.db = db
+        self.commit_rows = commit_rows
+        self._pending_rows = 0
+        self.committed_rows = 0
+        self._queue = queue.Queue(maxsize=depth)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        self.stop()
+
+    def start(self):
+        """Starts the background writer thread."""
+        self._thread.start()
+
+    def submit(self, columns: Dict[str, list], processed_files: List[str]):
+        """
+        Queues a batch for insertion, blocking while the queue is full.
+        The batch must not be modified afterwards. Raises the error of an earlier failed write, if any.
+        """
+        self._raise_error()
+        self._queue.put((columns, processed_files))
+
+    def stop(self):
+        """Writes and commits the remaining batches, waits for the thread and raises a pending write error."""
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                break
+            # After a failure, keep draining so producers never block on a full queue
+            if self._error is not None:
+                continue
+            try:
+                columns, processed_files = batch
+                self._pending_rows += len(columns["dat_filename"])
+                commit = self._pending_rows >= self.commit_rows
+                self.db.insert_batch(columns, processed_files, commit=commit)
+                if commit:
+                    self.committed_rows += self._pending_rows
+                    self._pending_rows = 0
+            except Exception as error:
+                self._error = error
+        
+        if self._error is None:
+            try:
+                self.db.commit()
+                self.committed_rows += self._pending_rows
+                self._pending_rows = 0
+            except Exception as error:
+                self._error = error
@@ -1,6 +1,6 @@
 import os
 import pytest
-from turbo_tosec.parser import DatFileParser
+from turbo_tosec.parser import DatFileParser, HEAD_BYTES
 
 SAMPLE_CMP_CONTENT = """clrmamepro (
     name "Commodore 64 - Games"
@@ -25,21 +25,12 @@ game (
 def parser():
     return DatFileParser()
 
-def test_is_cmp_file_detection(tmp_path, parser):
+def test_is_cmp_head_detection(parser):
     """
-    tests if _is_cmp_file correctly identifies a valid CMP file.
+    tests if _is_cmp_head correctly identifies the head of a CMP file (as sniffed by parse()).
     """
-    # 1. Create a valid CMP file
-    cmp_file = tmp_path / "test.dat"
-    cmp_file.write_text(SAMPLE_CMP_CONTENT, encoding="utf-8")
-    
-    # 2. Create an invalid (XML) file
-    xml_file = tmp_path / "test.xml"
-    xml_file.write_text("<?xml version='1.0'?><datafile>...</datafile>", encoding="utf-8")
-
-    # 3. Test
-    assert parser._is_cmp_file(str(cmp_file)) is True
-    assert parser._is_cmp_file(str(xml_file)) is False
+    assert parser._is_cmp_head(SAMPLE_CMP_CONTENT[:HEAD_BYTES]) is True
+    assert parser._is_cmp_head("<?xml version='1.0'?><datafile>...</datafile>") is False
 
 def test_cmp_parsing_logic(tmp_path, parser):
     """
@@ -54,19 +45,33 @@ def test_cmp_parsing_logic(tmp_path, parser):
     
     # 3 .Verify the results
     # Expected: 2 games (rows) should be returned
-    assert len(results) == 2
+    assert len(results["rom_name"]) == 2
     
     # Check the first game's data
-    # Tuple elements: (filename, platform, game, desc, rom, size, crc, md5, sha1, status, system)
-    game1 = results[0]
-    assert game1[2] == "Test Game (1986)"      # Game Name
-    assert game1[3] == "Test Game Description" # Description
-    assert game1[4] == "test.zip"              # ROM Name
-    assert game1[5] == 100                     # Size (Integer olmalı)
-    assert game1[6] == "12345678"              # CRC
+    # Columnar batch: one list per 'roms' column (filename, platform, game, desc, rom, size, crc, md5, sha1, status, system)
+    assert results["game_name"][0] == "Test Game (1986)"      # Game Name
+    assert results["description"][0] == "Test Game Description" # Description
+    assert results["rom_name"][0] == "test.zip"              # ROM Name
+    assert results["size"][0] == 100                     # Size (Integer olmalı)
+    assert results["crc"][0] == "12345678"              # CRC
 
     # Check the second game's data
-    game2 = results[1]
-    assert game2[2] == "Another Game"
-    assert game2[4] == "game2.rom"
-    assert game2[5] == 200
+    assert results["game_name"][1] == "Another Game"
+    assert results["rom_name"][1] == "game2.rom"
+    assert results["size"][1] == 200
+
+def test_cmp_rom_names_with_parens(tmp_path, parser):
+    """
+    TOSEC ROM names carry their tags in parens, the rom ( ... ) entry must not end at the first ')'.
+    """
+    dat_file = tmp_path / "games.dat"
+    dat_file.write_text(
+        'clrmamepro (\n    name "x"\n)\n\n'
+        'game (\n    name "Test Game (1986)(Publisher)"\n'
+        '    rom ( name "Test Game (1986)(Publisher).zip" size 100 crc 12345678 md5 abcd sha1 ef01 )\n)\n',
+        encoding="utf-8")
+
+    results = parser._parse_cmp(str(dat_file))
+
+    assert results["rom_name"] == ["Test Game (1986)(Publisher).zip"]
+    assert (results["size"], results["crc"], results["md5"], results["sha1"]) == ([100], ["12345678"], ["abcd"], ["ef01"])
@@ -1,6 +1,8 @@
 import pytest
+from turbo_tosec import parser as parser_module
+from turbo_tosec import database as database_module
 from turbo_tosec.parser import DatFileParser
-from turbo_tosec.database import DatabaseManager
+from turbo_tosec.database import DatabaseManager, ROM_COLUMNS
 from turbo_tosec._version import __version__
 
 SAMPLE_DAT_XML = """<?xml version="1.0"?>
@@ -16,6 +18,10 @@ SAMPLE_DAT_XML = """<?xml version="1.0"?>
 </datafile>
 """
 
+def to_columns(rows):
+    """Converts row tuples into the columnar batch format used by insert_batch."""
+    return {name: list(values) for name, values in zip(ROM_COLUMNS, zip(*rows))}
+
 @pytest.fixture
 def parser():
     
@@ -34,23 +40,111 @@ def test_platform_parsing(tmp_path, parser):
 
     results = parser.parse(str(dat_file))
 
-    assert len(results) == 1, "Parser should have found exactly 1 game"
+    assert len(results["rom_name"]) == 1, "Parser should have found exactly 1 game"
     
-    row = results[0]
-    assert row[0] == filename
-    assert row[1] == "Commodore 64"     # platform extracted from filename
-    assert row[2] == "Test Game (1986)"
+    assert results["dat_filename"][0] == filename
+    assert results["platform"][0] == "Commodore 64"     # platform extracted from filename
+    assert results["game_name"][0] == "Test Game (1986)"
+    assert results["system"][0] == "dats"               # parent folder name
+
+def test_xml_parsing_without_lxml(tmp_path, parser, monkeypatch):
+    """
+    The stdlib ElementTree fallback must produce the same batch as the lxml path.
+    """
+    dat_file = tmp_path / "Commodore 64 - Games - T (TOSEC-v2020).dat"
+    dat_file.write_text(SAMPLE_DAT_XML, encoding="utf-8")
+    expected = parser.parse(str(dat_file))
+
+    monkeypatch.setattr(parser_module, "lxml_etree", None)
+
+    assert parser.parse(str(dat_file)) == expected
+    assert expected["size"] == [100]
+
+def test_xml_malformed_size_is_null(tmp_path, parser):
+    
+    dat_file = tmp_path / "Atari ST - Games.dat"
+    dat_file.write_text(SAMPLE_DAT_XML.replace('size="100"', 'size="1O0"'), encoding="utf-8")
+
+    assert parser.parse(str(dat_file))["size"] == [None]
+
+def test_dedupe_descriptions(tmp_path):
+    """
+    Descriptions repeating the game name are only dropped when asked for.
+    """
+    dat_file = tmp_path / "Atari ST - Games.dat"
+    dat_file.write_text(SAMPLE_DAT_XML.replace("Test Game Desc", "Test Game (1986)"), encoding="utf-8")
+
+    assert DatFileParser().parse(str(dat_file))["description"] == ["Test Game (1986)"]
+    assert DatFileParser(dedupe_descriptions=True).parse(str(dat_file))["description"] == [None]
 
 def test_database_integration(tmp_path):
    
     db_path = str(tmp_path / "test.duckdb")
     
     with DatabaseManager(db_path) as db:
-        mock_data = [
+        mock_rows = [
             ("Amiga.dat", "Commodore Amiga", "Game X", "Desc", "rom.adf", 500, "c", "m", "s", "good", "folder")
         ]
         
-        db.insert_batch(mock_data)
+        db.insert_batch(to_columns(mock_rows))
 
         res = db.conn.execute("SELECT platform FROM roms").fetchone()
         assert res[0] == "Commodore Amiga"
+
+@pytest.mark.parametrize("use_arrow", [True, False])
+def test_insert_batch_multiple_rows(tmp_path, monkeypatch, use_arrow):
+    
+    if not use_arrow:
+        # Fallback path of installs without pyarrow
+        monkeypatch.setattr(database_module, "pa", None)
+    db_path = str(tmp_path / "test.duckdb")
+    
+    with DatabaseManager(db_path) as db:
+        mock_rows = [
+            ("A.dat", "Atari ST", "Game A", "Desc", "a.st", 100, "c1", None, None, "good", "folder"),
+            ("B.dat", "Atari ST", "Game B", "", "b.st", None, "c2", "m2", "s2", "bad", "folder"),
+        ]
+        
+        db.insert_batch(to_columns(mock_rows))
+
+        assert db.conn.execute("SELECT count(*), sum(size) FROM roms").fetchone() == (2, 100)
+        assert db.get_processed_files() == {"A.dat", "B.dat"}
+
+def test_insert_batch_failure_marks_nothing(tmp_path):
+    """
+    ROM rows and processed-file markers share a transaction: a failed batch must leave no trace.
+    """
+    db_path = str(tmp_path / "test.duckdb")
+    
+    with DatabaseManager(db_path) as db:
+        bad_rows = [
+            ("A.dat", "Atari ST", "Game A", "Desc", "a.st", 100, "c1", "m1", "s1", "good", "folder"),
+            ("B.dat", "Atari ST", "Game B", "Desc", "b.st", "not a size", "c2", "m2", "s2", "good", "folder"),
+        ]
+        
+        with pytest.raises(Exception):
+            db.insert_batch(to_columns(bad_rows), ["A.dat", "B.dat"])
+
+        assert db.conn.execute("SELECT count(*) FROM roms").fetchone()[0] == 0
+        assert db.get_processed_files() == set()
+
+def test_xml_with_clrmamepro_header_is_parsed_as_xml(tmp_path, parser):
+    """
+    A Logiqx <clrmamepro/> header element must not route an XML DAT to the CMP parser.
+    """
+    dat_file = tmp_path / "Commodore 64 - Games - T (TOSEC-v2020).dat"
+    dat_file.write_text(SAMPLE_DAT_XML.replace("</header>", '<clrmamepro header="c64.xml"/></header>'), encoding="utf-8")
+
+    results = parser.parse(str(dat_file))
+
+    assert results["rom_name"] == ["test.tap"]
+
+def test_parse_rejects_unknown_format(tmp_path, parser):
+    """
+    Files that are neither XML nor CMP must fail fast instead of reaching a full parser.
+    """
+    junk_file = tmp_path / "junk.dat"
+    junk_file.write_bytes(b"\x00\x01\x02 binary game data, not a DAT file")
+
+    with pytest.raises(ValueError):
+        parser.parse(str(junk_file))
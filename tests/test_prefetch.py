@@ -0,0 +1,20 @@
+from turbo_tosec.prefetch import FilePrefetcher, warm_file
+
+def test_warm_file_ignores_missing_files(tmp_path):
+    
+    # Prefetching is only a hint, a missing file must not raise
+    warm_file(str(tmp_path / "missing.dat"))
+
+def test_prefetcher_runs_ahead_and_stops(tmp_path):
+    
+    files = []
+    for i in range(5):
+        dat_file = tmp_path / f"{i}.dat"
+        dat_file.write_text("<datafile/>", encoding="utf-8")
+        files.append(str(dat_file))
+
+    with FilePrefetcher(files, depth=2) as prefetcher:
+        for _ in files:
+            prefetcher.advance()
+
+    assert not prefetcher._thread.is_alive()
@@ -0,0 +1,87 @@
+import argparse
+import pytest
+from turbo_tosec.database import DatabaseManager
+from turbo_tosec.session import ImportSession, _make_chunks
+from turbo_tosec.utils import get_dat_files
+
+GAME_XML = '<game name="Game {index}"><description>Game {index}</description><rom name="game{index}.bin" size="{index}" crc="00"/></game>'
+
+def make_args(**overrides):
+    
+    args = argparse.Namespace(workers=1, batch_size=10, prefetch=False, dedupe_descriptions=False)
+    for key, value in overrides.items():
+        setattr(args, key, value)
+    return args
+
+@pytest.fixture
+def dat_dir(tmp_path):
+    
+    system_dir = tmp_path / "dats" / "Commodore 64"
+    system_dir.mkdir(parents=True)
+    for file_index in range(6):
+        games = "".join(GAME_XML.format(index=i) for i in range(5))
+        dat_file = system_dir / f"Commodore 64 - Games - {file_index}.dat"
+        dat_file.write_text(f'<?xml version="1.0"?><datafile>{games}</datafile>', encoding="utf-8")
+        
+    return tmp_path / "dats"
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_session_imports_all_files(tmp_path, dat_dir, workers):
+    """
+    Runs a full import (serial and process pool) and checks every ROM and file marker lands in the DB.
+    """
+    files = get_dat_files(str(dat_dir))
+    
+    with DatabaseManager(str(tmp_path / "test.duckdb")) as db:
+        session = ImportSession(make_args(workers=workers), db, files)
+        total_roms, error_count = session.run(files)
+
+        assert (total_roms, error_count) == (30, 0)
+        assert db.conn.execute("SELECT count(*), sum(size) FROM roms").fetchone() == (30, 60)
+        assert len(db.get_processed_files()) == 6
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_session_counts_malformed_files(tmp_path, dat_dir, workers):
+    """
+    A malformed DAT is reported back to the parent as an error and never marked as processed.
+    """
+    (dat_dir / "Commodore 64" / "Commodore 64 - Broken.dat").write_text(
+        '<?xml version="1.0"?><datafile><game name="x"><rom ', encoding="utf-8")
+    files = get_dat_files(str(dat_dir))
+    
+    with DatabaseManager(str(tmp_path / "test.duckdb")) as db:
+        session = ImportSession(make_args(workers=workers), db, files)
+
+        assert session.run(files) == (30, 1)
+        assert "Commodore 64 - Broken.dat" not in db.get_processed_files()
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_session_aborts_on_failed_write(tmp_path, dat_dir, workers, monkeypatch):
+    """
+    A failed background write stops the import: later files are neither blamed for it nor buffered forever.
+    """
+    files = get_dat_files(str(dat_dir))
+    calls = []
+    
+    def failing_insert(*args, **kwargs):
+        calls.append(args)
+        raise RuntimeError("write failure")
+    
+    with DatabaseManager(str(tmp_path / "test.duckdb")) as db:
+        monkeypatch.setattr(db, "insert_batch", failing_insert)
+        session = ImportSession(make_args(workers=workers), db, files)
+
+        assert session.run(files) == (0, 0)
+        assert len(calls) == 1
+        assert session.buffer_rows <= 10
+
+def test_make_chunks_spreads_largest_files():
+    """
+    The largest DATs are submitted first, but each in its own task instead of back to back in one worker.
+    """
+    files = [(f"{size}.dat", size) for size in range(1, 201)]
+    chunks = _make_chunks(files, workers=2)
+    
+    assert sorted(item for chunk in chunks for item in chunk) == sorted(files)
+    assert [chunk[0][1] for chunk in chunks[:4]] == [200, 199, 198, 197]
+    assert max(len(chunk) for chunk in chunks) <= 16
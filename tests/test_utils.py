@@ -0,0 +1,33 @@
+import os
+import pytest
+from turbo_tosec.utils import get_dat_files
+
+def test_get_dat_files_recursive_with_sizes(tmp_path):
+    """
+    Tests that .dat files are found in nested folders (case-insensitive) together with their sizes.
+    """
+    nested = tmp_path / "Commodore" / "C64"
+    nested.mkdir(parents=True)
+    (tmp_path / "top.dat").write_bytes(b"12345")
+    (nested / "Games.DAT").write_bytes(b"123")
+    (nested / "readme.txt").write_bytes(b"ignored")
+
+    results = dict(get_dat_files(str(tmp_path)))
+
+    assert results == {
+        str(tmp_path / "top.dat"): 5,
+        str(nested / "Games.DAT"): 3,
+    }
+
+@pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt", reason="needs POSIX symlinks")
+def test_get_dat_files_skips_unreadable_entry(tmp_path):
+    """
+    A dangling .dat symlink is skipped on its own, the rest of its directory is still scanned.
+    """
+    (tmp_path / "a.dat").symlink_to(tmp_path / "missing.dat")
+    for name in ("f1.dat", "f2.dat", "f3.dat"):
+        (tmp_path / name).write_bytes(b"1234")
+
+    results = dict(get_dat_files(str(tmp_path)))
+
+    assert results == {str(tmp_path / name): 4 for name in ("f1.dat", "f2.dat", "f3.dat")}
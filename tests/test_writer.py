@@ -0,0 +1,40 @@
+import pytest
+from turbo_tosec.database import DatabaseManager, ROM_COLUMNS
+from turbo_tosec.writer import BatchWriter
+
+def make_batch(dat_filename, size):
+    
+    row = (dat_filename, "Atari ST", "Game", "Desc", "game.st", size, "c", "m", "s", "good", "folder")
+    return {name: [value] for name, value in zip(ROM_COLUMNS, row)}
+
+def test_writer_inserts_all_batches(tmp_path):
+    
+    with DatabaseManager(str(tmp_path / "test.duckdb")) as db:
+        # Grouped commits: the last (partial) group is committed on stop
+        with BatchWriter(db, depth=1, commit_rows=2) as writer:
+            for i in range(5):
+                writer.submit(make_batch(f"{i}.dat", i), [f"{i}.dat"])
+
+        assert db.conn.execute("SELECT count(*), sum(size) FROM roms").fetchone() == (5, 10)
+        assert writer.committed_rows == 5
+        assert len(db.get_processed_files()) == 5
+
+def test_writer_reports_failed_write(tmp_path):
+    """
+    A failed background insert must surface in the caller's thread, not disappear with the writer,
+    and must roll back the uncommitted batches grouped with it.
+    """
+    with DatabaseManager(str(tmp_path / "test.duckdb")) as db:
+        writer = BatchWriter(db, commit_rows=2)
+        writer.start()
+        writer.submit(make_batch("first.dat", 1), ["first.dat"])
+        writer.submit(make_batch("second.dat", 2), ["second.dat"])
+        writer.submit(make_batch("good.dat", 1), ["good.dat"])
+        writer.submit(make_batch("bad.dat", "not a size"), ["bad.dat"])
+
+        with pytest.raises(Exception):
+            writer.stop()
+        # Only the first (committed) group is counted and stored
+        assert writer.committed_rows == 2
+        assert db.conn.execute("SELECT count(*) FROM roms").fetchone()[0] == 2
+        assert db.get_processed_files() == {"first.dat", "second.dat"}